@@ -0,0 +1,26 @@
+# Gunicorn configuration for the Miele gateway (used by run.sh)
+# The gateway is I/O-bound (every request waits on the appliance), so each
+# worker runs a pool of threads; a few workers spread request handling across
+# cores without crowding the other add-ons on small hosts.
+import multiprocessing
+import os
+
+port = int(os.environ.get('PORT', 3000))
+bind = f'0.0.0.0:{port}'
+worker_class = 'gthread'
+workers = min(4, max(2, multiprocessing.cpu_count()))
+threads = 8
+# Must exceed the 20s device request timeout used in miele_gateway.py
+timeout = 60
+# Import the app once in the master so workers inherit the parsed keys, HMAC state,
+# compiled regex and templates copy-on-write instead of rebuilding them per worker
+preload_app = True
+
+def when_ready(server):
+    from miele_gateway import log_startup_banner
+    log_startup_banner(port)
+
+def post_fork(server, worker):
+    # Each worker gets its own connection pool instead of sockets inherited from the master
+    import miele_gateway
+    miele_gateway.device_session = miele_gateway.create_device_session()
@@ -4,19 +4,31 @@ import json
 import hmac
 import hashlib
 import ipaddress
+import ssl
+import logging
+from functools import lru_cache
 from flask import Flask, request, jsonify, Response
 import requests as req
-from datetime import datetime, timezone # Ensure timezone aware datetime
+import time
+from email.utils import formatdate # Locale-independent RFC 7231 date formatting
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
-import traceback # Added for potentially better error logging
+try:
+    import orjson # Optional: faster JSON parsing/serialization for explore mode
+except ImportError:
+    orjson = None
 
 # --- Initialize Flask App FIRST ---
 app = Flask(__name__)
 
 # --- Configuration ---
-# Debug flag - Set to True for verbose logging AND printing full keys on startup
-debug_log = False # <<< SET TO True TO ENABLE DEBUG LOGGING AND KEY PRINTING >>>
+# Debug flag - verbose logging AND printing full keys on startup; set MIELE_DEBUG=1 (add-on option DEBUG) to enable
+debug_log = os.environ.get('MIELE_DEBUG', '0') == '1'
+
+# Plain message format keeps the add-on log readable; debug output is only formatted when enabled
+logging.basicConfig(format='%(message)s')
+logger = logging.getLogger('miele_gateway')
+logger.setLevel(logging.DEBUG if debug_log else logging.INFO)
 
 # Group Key and Group ID from environment variables or default values
 # Ensure your actual keys are set as environment variables for security
@@ -27,39 +39,111 @@ try:
     group_key = bytes.fromhex(group_key_hex)
     group_id = bytes.fromhex(group_id_hex)
     if len(group_key) != 64:
-        print("Warning: GROUP_KEY length is not 64 bytes (128 hex chars).")
+        logger.warning("Warning: GROUP_KEY length is not 64 bytes (128 hex chars).")
     if len(group_id) != 8:
-        print("Warning: GROUP_ID length is not 8 bytes (16 hex chars).")
+        logger.warning("Warning: GROUP_ID length is not 8 bytes (16 hex chars).")
 except ValueError:
-    print("Error: GROUP_KEY or GROUP_ID environment variables contain invalid hex characters.")
+    logger.error("Error: GROUP_KEY or GROUP_ID environment variables contain invalid hex characters.")
     group_key = bytes(64) # Use placeholder on error
     group_id = bytes(8)   # Use placeholder on error
 
+# HMAC-SHA256 state keyed with group_key; copied per request so the key pads are only hashed once
+hmac_base = hmac.new(group_key, b'', hashlib.sha256)
+
 # Standard Miele Accept header
 accept_header = 'application/vnd.miele.v1+json'
+user_agent = 'Miele@mobile 2.3.3 Android'
+
+# Per-process constants for signed requests; headers are copied and completed per request
+group_id_upper = group_id.hex().upper()
+group_key_upper = group_key.hex().upper() # Only sent by /init (commissioning)
+auth_prefix = f'MieleH256 {group_id_upper}:'
+signing_accept_line = f'\n\n{accept_header}\n'.encode('ascii') # Constant middle of the signing string
+base_headers = { 'Accept': accept_header, 'User-Agent': user_agent, 'Accept-Encoding': 'gzip' }
+
+def create_device_session():
+    """Creates the pooled HTTP session used for all device requests (one per process)."""
+    session = req.Session()
+    session.mount('http://', req.adapters.HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=0))
+    return session
+
+# Shared HTTP session so keep-alive connections to appliances are reused between requests
+device_session = create_device_session()
+
+# RFC 1123 hostname: dot-separated labels of 1-63 alphanumerics/hyphens, no leading/trailing hyphen
+hostname_regex = re.compile(
+    r'^(([a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?)\.)*[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?$'
+)
+
+# Explore mode pages, filled with bytes %-formatting (values are UTF-8 bytes)
+explore_html_template = b'<!DOCTYPE html><html lang="en"><head><meta charset="UTF-8"><title>Explore: %b</title><style>body{font-family:sans-serif;margin:1em;} h1{border-bottom:1px solid #ccc;} pre{white-space:pre-wrap;background:#f0f0f0;padding:1em;border:1px solid #ddd;} a{color:blue;}</style></head><body><h1>%b</h1><pre>%b</pre></body></html>'
+explore_not_json_html_template = b'<!DOCTYPE html><html lang="en"><head><title>Explore Error: Not JSON</title><style>.error{color:red;} body{font-family:monospace;white-space:pre;}</style></head><body><h1>Error: Response was not valid JSON</h1><p class="error">Path: %b</p><hr><p>%b</p></body></html>'
 
 # --- Helper Functions ---
+http_date_cache = (0, '') # (epoch second, formatted date); replaced as one tuple so threads never see a mismatched pair
+
 def get_current_time_in_http_format():
-    """Generates the current time in UTC RFC 7231 format."""
-    return datetime.now(timezone.utc).strftime('%a, %d %b %Y %H:%M:%S GMT')
+    """Generates the current time in UTC RFC 7231 format, reformatting at most once per second."""
+    global http_date_cache
+    now = int(time.time())
+    cached_second, cached_date = http_date_cache
+    if now != cached_second:
+        cached_date = formatdate(now, usegmt=True)
+        http_date_cache = (now, cached_date)
+    return cached_date
 
 def is_valid_host(host):
     """Validates if the host string is a valid hostname or IP address."""
-    if not host: return False
+    if not host or len(host) > 253: return False
+    if host[0].isdigit() or ':' in host: # Only these can be IPv4/IPv6 literals; skips the ValueError path for names
+        try:
+            ipaddress.ip_address(host)
+            return True
+        except ValueError: pass
+    return hostname_regex.match(host) is not None
+
+def normalize_device_path(parts, trailing_slash):
+    """
+    Builds the device resource path from the URL segments after the host.
+    The device root is always '/'; otherwise a trailing slash is kept only if the request had one.
+    """
+    path = '/' + '/'.join(parts).rstrip('/')
+    return path + '/' if trailing_slash and path != '/' else path
+
+def build_signing_bytes(host, resource_path, http_date):
+    """Builds the UTF-8 string signed for a GET request, assembled directly as bytes."""
+    return b''.join((b'GET\n', host.encode('utf-8'), resource_path.encode('utf-8'), signing_accept_line, http_date.encode('ascii'), b'\n'))
+
+@lru_cache(maxsize=256)
+def build_auth_header(host, resource_path, http_date):
+    """
+    Returns the MieleH256 Authorization header value for a GET request.
+    Cached because polling clients repeat the same host/path within one Date second.
+    """
+    hmac_ctx = hmac_base.copy()
+    hmac_ctx.update(build_signing_bytes(host, resource_path, http_date))
+    return auth_prefix + hmac_ctx.digest().hex().upper()
+
+def cpu_has_flag(flag):
+    """Checks /proc/cpuinfo for a CPU feature flag (e.g. 'sha_ni'). Returns None if unreadable."""
     try:
-        ipaddress.ip_address(host)
-        return True
-    except ValueError:
-        hostname_regex = re.compile(
-            r'^(([a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?)\.)*[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?$'
-        )
-        return len(host) <= 253 and re.match(hostname_regex, host) is not None
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith(('flags', 'Features')): return flag in line.split(':', 1)[1].split()
+    except OSError: return None
+    return False
+
+@lru_cache(maxsize=4)
+def get_aes_algorithm(key):
+    """Returns a cached AES algorithm object for the key (the group key is fixed for the process lifetime)."""
+    return algorithms.AES(key)
 
 def decrypt(payload, group_key, signature_hex):
     """
     Decrypts the payload using AES-256-CBC with key/IV derived from group_key
-    and the response signature, using standard finalization for padding.
+    and the response signature. No padding is removed; the plaintext is returned as sent.
     """
+    if not payload or len(payload) % 16: raise ValueError(f"Ciphertext length {len(payload)} is not a non-zero multiple of the 16-byte AES block size")
     if len(group_key) < 32: raise ValueError("Group key too short (< 32 bytes) to derive AES-256 key")
     key = group_key[:32]
     try: iv_buf = bytes.fromhex(signature_hex)
@@ -67,51 +151,66 @@ def decrypt(payload, group_key, signature_hex):
     if len(iv_buf) < 16: raise ValueError("Server signature too short (< 16 bytes) to derive 16-byte IV")
     iv = iv_buf[:16]
 
-    if debug_log:
-        print(f"-- Decryption Start --")
-        print(f"Using Key (first 4 bytes): {key[:4].hex()}...")
-        print(f"Using IV: {iv.hex()}")
-        print(f"Ciphertext length: {len(payload)}")
-        print(f"Ciphertext sample (first 32 bytes): {payload[:32].hex()}")
-    try:
-        cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
-        decryptor = cipher.decryptor()
-        decrypted_data = decryptor.update(payload) + decryptor.finalize()
-        if debug_log:
-            print(f"Plaintext length after finalize: {len(decrypted_data)}")
-            sample = decrypted_data[:200].decode('utf-8', errors='replace')
-            print(f"Plaintext sample (first 200 bytes decoded): {sample}{'...' if len(decrypted_data)>200 else ''}")
-            print(f"-- Decryption End --")
-        return decrypted_data
-    except ValueError as e:
-        print(f"Decryption error (likely padding/key/IV issue): {e}")
-        raise
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("-- Decryption Start --")
+        logger.debug("Using Key (first 4 bytes): %s...", key[:4].hex())
+        logger.debug("Using IV: %s", iv.hex())
+        logger.debug("Ciphertext length: %d", len(payload))
+        logger.debug("Ciphertext sample (first 32 bytes): %s", payload[:32].hex())
+    cipher = Cipher(get_aes_algorithm(key), modes.CBC(iv)) # No backend argument: cryptography always uses its bundled OpenSSL
+    decryptor = cipher.decryptor()
+    decrypted_data = decryptor.update(payload) # Whole blocks (checked above), so finalize() would add nothing
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Plaintext length: %d", len(decrypted_data))
+        sample = decrypted_data[:200].decode('utf-8', errors='replace')
+        logger.debug("Plaintext sample (first 200 bytes decoded): %s%s", sample, '...' if len(decrypted_data)>200 else '')
+        logger.debug("-- Decryption End --")
+    return decrypted_data
+
+def json_loads(data):
+    """Parses JSON from raw bytes, using orjson when installed."""
+    if orjson: return orjson.loads(data)
+    return json.loads(data.decode('utf-8', errors='replace'))
+
+def json_dumps_pretty(obj):
+    """Serializes to 2-space indented JSON as UTF-8 bytes, using orjson when installed."""
+    if orjson: return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
 
 def iterate_to_all_hrefs(obj, host, base_path):
     """
-    Recursively traverses JSON data (dicts/lists) and replaces 'href' values
-    with full proxy links suitable for the '/explore/' route.
+    Traverses JSON data (dicts/lists) with an explicit stack and replaces 'href'
+    values with full proxy links suitable for the '/explore/' route.
     """
-    if isinstance(obj, dict):
-        for key, value in obj.items():
-            if key == 'href' and isinstance(value, str) and value:
-                relative_path = value.lstrip('/')
-                base = base_path.rstrip('/')
-                full_target_path = f"{base}/{relative_path}" if base != '/' else f"/{relative_path}"
-                proxy_link = f'/explore/{host}/{full_target_path.lstrip("/")}'
-                obj[key] = f'<a href="{proxy_link}">{value}</a>'
-            else: iterate_to_all_hrefs(value, host, base_path)
-    elif isinstance(obj, list):
-        for item in obj: iterate_to_all_hrefs(item, host, base_path)
+    # hrefs are relative to the current device path; build the shared link prefix once
+    base = base_path.strip('/')
+    link_prefix = f'/explore/{host}/{base}/' if base else f'/explore/{host}/'
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == 'href' and isinstance(value, str) and value:
+                    node[key] = f'<a href="{link_prefix}{value.lstrip("/")}">{value}</a>'
+                elif isinstance(value, (dict, list)): stack.append(value)
+        elif isinstance(node, list):
+            stack.extend(item for item in node if isinstance(item, (dict, list)))
 
 # --- Route Definitions ---
+class GatewayError(Exception):
+    """A GET request that cannot be proxied; carries the client error message, HTTP status and optional log line."""
+    def __init__(self, message, status_code, log_message=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.log_message = log_message
+
 @app.route('/init/<path:resource>', methods=['GET'])
 def init(resource):
     """
     Handles the initial commissioning request to the device.
     Sends an *UNSIGNED* PUT request, assuming device doesn't know keys yet.
     """
-    if debug_log: print(f"\n=== INIT Request Received ===\nRequest URL: {request.url}")
+    if logger.isEnabledFor(logging.DEBUG): logger.debug("\n=== INIT Request Received ===\nRequest URL: %s", request.url)
     path_parts = resource.strip('/').split('/')
     if not path_parts: return jsonify({'error': 'Missing host in path'}), 400
     host = path_parts[0]
@@ -123,123 +222,147 @@ def init(resource):
     try:
         current_time_gmt = get_current_time_in_http_format()
         content_type_header = 'application/json; charset=utf-8' # Define Content-Type
-        payload_data = { 'GroupID': group_id.hex().upper(), 'GroupKey': group_key.hex().upper() }
-        headers = {
-            'Accept': accept_header, 'Date': current_time_gmt,
-            'User-Agent': 'Miele@mobile 2.3.3 Android', 'Host': host,
-            'Accept-Encoding': 'gzip', 'Content-Type': content_type_header,
-        }
-        if debug_log:
-            print(f"Target URL: PUT {target_url}")
-            print(f"Request Headers: {json.dumps(headers, indent=2)}")
-            print(f"Request Body (for sending): {json.dumps(payload_data, indent=2)}")
-            print(f"(Sending INIT request UNSIGNED)")
-        response = req.put(target_url, headers=headers, json=payload_data, timeout=20)
-        if debug_log:
-             print(f"--- INIT Response ---")
-             print(f"Status Code: {response.status_code}")
-             print(f"Response Headers: {json.dumps(dict(response.headers), indent=2)}")
-             try: print(f"Response JSON: {response.json()}")
-             except json.JSONDecodeError: print(f"Response Content (non-JSON or empty): {response.text}")
+        payload_data = { 'GroupID': group_id_upper, 'GroupKey': group_key_upper }
+        headers = base_headers.copy() # Same static headers as signed requests, minus Authorization
+        headers['Date'] = current_time_gmt
+        headers['Host'] = host
+        headers['Content-Type'] = content_type_header
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Target URL: PUT %s", target_url)
+            logger.debug("Request Headers: %s", json.dumps(headers, indent=2))
+            logger.debug("Request Body (for sending): %s", json.dumps(payload_data, indent=2))
+            logger.debug("(Sending INIT request UNSIGNED)")
+        response = device_session.put(target_url, headers=headers, json=payload_data, timeout=20)
+        if logger.isEnabledFor(logging.DEBUG):
+             logger.debug("--- INIT Response ---")
+             logger.debug("Status Code: %s", response.status_code)
+             logger.debug("Response Headers: %s", json.dumps(dict(response.headers), indent=2))
+             try: logger.debug("Response JSON: %s", response.json())
+             except json.JSONDecodeError: logger.debug("Response Content (non-JSON or empty): %s", response.text)
         response.raise_for_status()
         return response.content, response.status_code, response.headers.items()
-    except req.exceptions.HTTPError as e: status_code = e.response.status_code if e.response is not None else 500; error_message = f"HTTP error from device: {status_code}"; details = e.response.text if e.response is not None and e.response.text else 'No details provided.'; print(f'HTTP error during /init request to {host}: {status_code} {e.response.reason if e.response is not None else ""}\nResponse body: {details}'); return jsonify({'error': error_message, 'details': details}), status_code
-    except req.exceptions.Timeout: print(f'Timeout during /init request to {host}'); return jsonify({'error': 'Device communication timed out'}), 504
-    except req.exceptions.ConnectionError: print(f'Connection error during /init request to {host}'); return jsonify({'error': 'Device connection refused or unavailable'}), 503
-    except req.exceptions.RequestException as e: print(f'Network request error during /init to {host}: {e}'); return jsonify({'error': f'Network request failed: {e}'}), 500
-    except Exception as e: print(f'Unexpected error during /init: {e}'); traceback.print_exc(); return jsonify({'error': 'Internal Server Error occurred during initialization'}), 500
+    except req.exceptions.HTTPError as e: status_code = e.response.status_code if e.response is not None else 500; error_message = f"HTTP error from device: {status_code}"; details = e.response.text if e.response is not None and e.response.text else 'No details provided.'; logger.error('HTTP error during /init request to %s: %s %s\nResponse body: %s', host, status_code, e.response.reason if e.response is not None else "", details); return jsonify({'error': error_message, 'details': details}), status_code
+    except req.exceptions.Timeout: logger.error('Timeout during /init request to %s', host); return jsonify({'error': 'Device communication timed out'}), 504
+    except req.exceptions.ConnectionError: logger.error('Connection error during /init request to %s', host); return jsonify({'error': 'Device connection refused or unavailable'}), 503
+    except req.exceptions.RequestException as e: logger.error('Network request error during /init to %s: %s', host, e); return jsonify({'error': f'Network request failed: {e}'}), 500
+    except Exception as e: logger.exception('Unexpected error during /init: %s', e); return jsonify({'error': 'Internal Server Error occurred during initialization'}), 500
+
+def parse_device_target(resource):
+    """Splits '<host>/<device_path>' into the device host and normalized resource path."""
+    path_parts = resource.strip('/').split('/')
+    if not path_parts or not path_parts[0]: raise GatewayError('Missing host in request path. Use format /<host>/<device_path>', 400)
+    host = path_parts[0]
+    if not is_valid_host(host): raise GatewayError(f"Invalid host format provided: '{host}'", 400)
+    # Path Handling (Trailing Slash Fix)
+    original_request_path_had_trailing_slash = resource.endswith('/')
+    resource_path_on_device = normalize_device_path(path_parts[1:], original_request_path_had_trailing_slash)
+    logger.debug("Target Host: %s\nOriginal had trailing slash: %s\nFinal Target Resource Path (used for signing & URL): '%s'", host, original_request_path_had_trailing_slash, resource_path_on_device)
+    return host, resource_path_on_device
+
+def fetch_and_decrypt(host, resource_path_on_device):
+    """
+    Sends the signed GET request to the device and returns (status_code, decrypted_bytes).
+    decrypted_bytes is None for 204 / empty responses.
+    """
+    current_time_gmt = get_current_time_in_http_format()
+    auth_header_value = build_auth_header(host, resource_path_on_device, current_time_gmt)
+    # Prepare Headers
+    headers = base_headers.copy()
+    headers['Date'] = current_time_gmt
+    headers['Host'] = host
+    headers['Authorization'] = auth_header_value
+    target_url = f'http://{host}{resource_path_on_device}'
+    if logger.isEnabledFor(logging.DEBUG): logger.debug("Target URL: GET %s\nRequest Headers: %s\nString Signed (raw):\n%s", target_url, json.dumps(headers, indent=2), build_signing_bytes(host, resource_path_on_device, current_time_gmt).decode('utf-8').strip())
+    # Send Request
+    response = device_session.get(target_url, headers=headers, timeout=20)
+    if logger.isEnabledFor(logging.DEBUG): logger.debug("--- Device Response ---\nStatus Code: %s\nResponse Headers: %s", response.status_code, json.dumps(dict(response.headers), indent=2))
+    response.raise_for_status()
+    # Process Success Response
+    if response.status_code == 204 or not response.content:
+        logger.debug("Received 204 No Content or empty body.")
+        return response.status_code, None
+    # Decrypt Response
+    if len(response.content) % 16: raise GatewayError('Invalid encrypted body length from device', 500, f"Error: Encrypted body length {len(response.content)} is not a multiple of 16")
+    response_signature_header = response.headers.get('X-Signature', None)
+    if not response_signature_header: raise GatewayError('Missing required X-Signature header from device', 500, "Error: Missing X-Signature header")
+    sig_scheme, sig_sep, server_signature_hex = response_signature_header.partition(':')
+    if not sig_sep or ':' in server_signature_hex or not sig_scheme.startswith('MieleH256 '): raise GatewayError('Invalid X-Signature header format from device', 500, f"Error: Invalid X-Signature header format: '{response_signature_header}'")
+    return response.status_code, decrypt(response.content, group_key, server_signature_hex)
+
+def render_explore_page(host, resource_path_on_device, decrypted_bytes):
+    """Renders decrypted device JSON as an HTML page with hrefs turned into /explore/ links."""
+    page_path = f'{host}{resource_path_on_device}'.encode('utf-8')
+    try:
+        json_data = json_loads(decrypted_bytes)
+        if b'"href"' in decrypted_bytes: iterate_to_all_hrefs(json_data, host, resource_path_on_device) # Leaf resources have no links to rewrite
+        html_content = explore_html_template % (page_path, page_path, json_dumps_pretty(json_data))
+        return Response(html_content, mimetype='text/html', direct_passthrough=True)
+    except json.JSONDecodeError as e:
+        logger.warning("Warning: Decrypted data for explore mode is not valid JSON: %s", e)
+        html_content = explore_not_json_html_template % (page_path, decrypted_bytes.decode('utf-8', errors='replace').encode('utf-8'))
+        return Response(html_content, mimetype='text/html', status=200, direct_passthrough=True)
+
+def device_error_response(e, request_kind, target):
+    """Logs an exception raised while proxying a GET request and maps it to a JSON error response."""
+    if isinstance(e, GatewayError):
+        if e.log_message: logger.error(e.log_message)
+        return jsonify({'error': str(e)}), e.status_code
+    if isinstance(e, req.exceptions.HTTPError): status_code = e.response.status_code if e.response is not None else 500; error_message = f"HTTP error from device: {status_code}"; details = e.response.text if e.response is not None and e.response.text else 'No details provided.'; logger.error('HTTP error during %s to %s: %s %s\nResponse body: %s', request_kind, target, status_code, e.response.reason if e.response is not None else "", details); return jsonify({'error': error_message, 'details': details}), status_code
+    if isinstance(e, req.exceptions.Timeout): logger.error('Timeout during %s to %s', request_kind, target); return jsonify({'error': 'Device communication timed out'}), 504
+    if isinstance(e, req.exceptions.ConnectionError): logger.error('Connection error during %s to %s', request_kind, target); return jsonify({'error': 'Device connection refused or unavailable'}), 503
+    if isinstance(e, req.exceptions.RequestException): logger.error('Network request error during %s to %s: %s', request_kind, target, e); return jsonify({'error': f'Network request failed: {e}'}), 500
+    if isinstance(e, ValueError): logger.exception("Data processing error (decrypt/JSON/path): %s", e); return jsonify({'error': f'Data processing error: {e}'}), 500
+    logger.exception('Unexpected error during %s: %s', request_kind, e); return jsonify({'error': 'Internal Server Error occurred'}), 500
 
 @app.route('/explore/<path:resource>', methods=['GET'])
 def explore(resource):
-    """Route specifically for browser-friendly exploration."""
-    return main_route(resource, explore_mode=True)
+    """Route specifically for browser-friendly exploration; renders the decrypted JSON as linked HTML."""
+    if logger.isEnabledFor(logging.DEBUG): logger.debug("\n=== EXPLORE Request Received ===\nRequest URL: %s\nRaw resource path received: /%s", request.url, resource)
+    host = resource_path_on_device = ''
+    try:
+        host, resource_path_on_device = parse_device_target(resource)
+        status_code, decrypted_bytes = fetch_and_decrypt(host, resource_path_on_device)
+        if decrypted_bytes is None: return Response(f"<html><body><h1>{status_code} No Content</h1><p>Path: {host}{resource_path_on_device}</p></body></html>", mimetype='text/html', status=status_code)
+        return render_explore_page(host, resource_path_on_device, decrypted_bytes)
+    except Exception as e: return device_error_response(e, 'explore request', f'{host}{resource_path_on_device}')
 
 @app.route('/', defaults={'resource': ''})
 @app.route('/<path:resource>', methods=['GET'])
-def main_route(resource, explore_mode=False):
-    """Main route for GET requests, handling auth, decryption, and response formatting."""
+def main_route(resource):
+    """Main route for GET requests; returns the decrypted device JSON unchanged."""
     if resource == 'favicon.ico': return '', 204
-    is_explore_request = explore_mode
-    if debug_log: print(f"\n=== {'EXPLORE ' if is_explore_request else ''}Request Received ===\nRequest URL: {request.url}\nRaw resource path received: /{resource}")
-    path_parts = resource.strip('/').split('/')
-    if not path_parts or not path_parts[0]: return jsonify({'error': 'Missing host in request path. Use format /<host>/<device_path>'}), 400
-    host = path_parts[0]
-    if not is_valid_host(host): return jsonify({'error': f"Invalid host format provided: '{host}'"}), 400
-    # Path Handling (Trailing Slash Fix)
-    resource_path_part = '/'.join(path_parts[1:])
-    original_request_path_had_trailing_slash = resource.endswith('/')
-    resource_path_on_device = "/" + resource_path_part
-    current_path_has_trailing_slash = resource_path_on_device.endswith('/')
-    if original_request_path_had_trailing_slash and not current_path_has_trailing_slash and resource_path_on_device != '/': resource_path_on_device += '/'
-    elif not original_request_path_had_trailing_slash and current_path_has_trailing_slash and resource_path_on_device != '/': resource_path_on_device = resource_path_on_device.rstrip('/')
-    if len(path_parts) == 1 and original_request_path_had_trailing_slash: resource_path_on_device = '/'
-    elif len(path_parts) == 1 and not original_request_path_had_trailing_slash: resource_path_on_device = '/'
-    if debug_log: print(f"Target Host: {host}\nOriginal had trailing slash: {original_request_path_had_trailing_slash}\nFinal Target Resource Path (used for signing & URL): '{resource_path_on_device}'")
+    if logger.isEnabledFor(logging.DEBUG): logger.debug("\n=== Request Received ===\nRequest URL: %s\nRaw resource path received: /%s", request.url, resource)
+    host = resource_path_on_device = ''
     try:
-        current_time_gmt = get_current_time_in_http_format()
-        # Prepare Auth Signature
-        signing_string = f'GET\n{host}{resource_path_on_device}\n\n{accept_header}\n{current_time_gmt}\n'
-
-        # --- MODIFICATION: Revert signing encoding back to UTF-8 ---
-        signing_bytes = signing_string.encode('utf-8')
-        if debug_log: print("Using UTF-8 encoding for signing string.")
-        # --- End Modification ---
-
-        signature_bytes = hmac.new(group_key, signing_bytes, hashlib.sha256).digest()
-        signature_hex = signature_bytes.hex().upper()
-        auth_header_value = f'MieleH256 {group_id.hex().upper()}:{signature_hex}'
-        # Prepare Headers
-        headers = { 'Accept': accept_header, 'Date': current_time_gmt, 'User-Agent': 'Miele@mobile 2.3.3 Android', 'Host': host, 'Authorization': auth_header_value, 'Accept-Encoding': 'gzip' }
-        target_url = f'http://{host}{resource_path_on_device}'
-        if debug_log: print(f"Target URL: GET {target_url}\nRequest Headers: {json.dumps(headers, indent=2)}\nString Signed (raw):\n{signing_string.strip()}")
-        # Send Request
-        response = req.get(target_url, headers=headers, timeout=20)
-        if debug_log: print(f"--- Device Response ---\nStatus Code: {response.status_code}\nResponse Headers: {json.dumps(dict(response.headers), indent=2)}")
-        response.raise_for_status()
-        # Process Success Response
-        if response.status_code == 204 or not response.content:
-             if debug_log: print("Received 204 No Content or empty body.")
-             if is_explore_request: return Response(f"<html><body><h1>{response.status_code} No Content</h1><p>Path: {host}{resource_path_on_device}</p></body></html>", mimetype='text/html', status=response.status_code)
-             else: return Response(status=204, mimetype='application/json')
-        # Decrypt Response
-        response_signature_header = response.headers.get('X-Signature', None)
-        if not response_signature_header: print("Error: Missing X-Signature header"); return jsonify({'error': 'Missing required X-Signature header from device'}), 500
-        sig_parts = response_signature_header.split(':')
-        if len(sig_parts) != 2 or not sig_parts[0].startswith('MieleH256 '): print(f"Error: Invalid X-Signature header format: '{response_signature_header}'"); return jsonify({'error': 'Invalid X-Signature header format from device'}), 500
-        server_signature_hex = sig_parts[1]
-        decrypted_bytes = decrypt(response.content, group_key, server_signature_hex)
-        decrypted_str = decrypted_bytes.decode('utf-8', errors='replace')
-        # Return Based on Mode
-        if is_explore_request:
-            try:
-                json_data = json.loads(decrypted_str)
-                iterate_to_all_hrefs(json_data, host, resource_path_on_device)
-                html_content = f"""<!DOCTYPE html><html lang="en"><head><meta charset="UTF-8"><title>Explore: {host}{resource_path_on_device}</title><style>body{{font-family:sans-serif;margin:1em;}} h1{{border-bottom:1px solid #ccc;}} pre{{white-space:pre-wrap;background:#f0f0f0;padding:1em;border:1px solid #ddd;}} a{{color:blue;}}</style></head><body><h1>{host}{resource_path_on_device}</h1><pre>{json.dumps(json_data, indent=2)}</pre></body></html>"""
-                return Response(html_content, mimetype='text/html')
-            except json.JSONDecodeError as e:
-                print(f"Warning: Decrypted data for explore mode is not valid JSON: {e}")
-                html_content = f"""<!DOCTYPE html><html lang="en"><head><title>Explore Error: Not JSON</title><style>.error{{color:red;}} body{{font-family:monospace;white-space:pre;}}</style></head><body><h1>Error: Response was not valid JSON</h1><p class="error">Path: {host}{resource_path_on_device}</p><hr><p>{decrypted_str}</p></body></html>"""
-                return Response(html_content, mimetype='text/html', status=200)
-        else: return Response(decrypted_str, mimetype='application/json')
-    # Error Handling
-    except req.exceptions.HTTPError as e: status_code = e.response.status_code if e.response is not None else 500; error_message = f"HTTP error from device: {status_code}"; details = e.response.text if e.response is not None and e.response.text else 'No details provided.'; print(f'HTTP error during {"explore " if is_explore_request else ""}request to {host}{resource_path_on_device}: {status_code} {e.response.reason if e.response is not None else ""}\nResponse body: {details}'); return jsonify({'error': error_message, 'details': details}), status_code
-    except req.exceptions.Timeout: print(f'Timeout during {"explore " if is_explore_request else ""}request to {host}{resource_path_on_device}'); return jsonify({'error': 'Device communication timed out'}), 504
-    except req.exceptions.ConnectionError: print(f'Connection error during {"explore " if is_explore_request else ""}request to {host}{resource_path_on_device}'); return jsonify({'error': 'Device connection refused or unavailable'}), 503
-    except req.exceptions.RequestException as e: print(f'Network request error during {"explore " if is_explore_request else ""}request to {host}{resource_path_on_device}: {e}'); return jsonify({'error': f'Network request failed: {e}'}), 500
-    except ValueError as e: print(f"Data processing error (decrypt/JSON/path): {e}"); traceback.print_exc(); return jsonify({'error': f'Data processing error: {e}'}), 500
-    except Exception as e: print(f'Unexpected error during {"explore " if is_explore_request else ""}request: {e}'); traceback.print_exc(); return jsonify({'error': 'Internal Server Error occurred'}), 500
+        host, resource_path_on_device = parse_device_target(resource)
+        status_code, decrypted_bytes = fetch_and_decrypt(host, resource_path_on_device)
+        if decrypted_bytes is None: return Response(status=204, mimetype='application/json')
+        return Response(decrypted_bytes, mimetype='application/json', direct_passthrough=True) # Forward plaintext bytes as-is
+    except Exception as e: return device_error_response(e, 'request', f'{host}{resource_path_on_device}')
+
+# --- Startup ---
+def log_startup_banner(port):
+    """Logs the configuration summary; called by the dev server below and by gunicorn.conf.py."""
+    logger.info("--- Miele Proxy Server Starting ---")
+    logger.info("Listening on: http://0.0.0.0:%s", port)
+    if debug_log:
+        logger.info("Using Group ID (Debug): %s", group_id_hex)
+        logger.info("Using Group Key (Debug): %s", group_key_hex)
+    else:
+        logger.info("Using Group ID: ...%s", group_id.hex()[-4:].upper() if len(group_id)==8 else 'Invalid Length')
+        logger.info("Using Group Key: %s", 'Set (length OK)' if len(group_key)==64 else 'Invalid Length or Default')
+    sha_ni = cpu_has_flag('sha_ni')
+    logger.info("SHA-256 Backend: %s (SHA-NI: %s)", 'OpenSSL' if type(hashlib.sha256()).__module__ == '_hashlib' else 'Python builtin', 'Unknown' if sha_ni is None else 'Yes' if sha_ni else 'No')
+    aes_ni = cpu_has_flag('aes')
+    logger.info("OpenSSL: %s (hashlib), %s (cryptography) (CPU AES instructions: %s)", ssl.OPENSSL_VERSION, default_backend().openssl_version_text(), 'Unknown' if aes_ni is None else 'Yes' if aes_ni else 'No')
+    if os.environ.get('OPENSSL_ia32cap'): logger.warning("Warning: OPENSSL_ia32cap is set (%s); this can disable AES-NI/SHA-NI code paths.", os.environ['OPENSSL_ia32cap'])
+    logger.info("JSON Backend: %s", 'orjson' if orjson else 'stdlib json')
+    logger.info("Debug Logging: %s", 'Enabled' if debug_log else 'Disabled')
+    logger.info("---------------------------------")
 
 # --- Main Execution ---
+# Development server only; the add-on runs the app under gunicorn (see gunicorn.conf.py / run.sh)
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 3000))
-    print(f"--- Miele Proxy Server Starting ---")
-    print(f"Listening on: http://0.0.0.0:{port}")
-    if debug_log:
-        print(f"Using Group ID (Debug): {group_id_hex}")
-        print(f"Using Group Key (Debug): {group_key_hex}")
-    else:
-        print(f"Using Group ID: ...{group_id.hex()[-4:].upper() if len(group_id)==8 else 'Invalid Length'}")
-        print(f"Using Group Key: {'Set (length OK)' if len(group_key)==64 else 'Invalid Length or Default'}")
-    print(f"Debug Logging: {'Enabled' if debug_log else 'Disabled'}")
-    print(f"---------------------------------")
+    log_startup_banner(port)
     app.run(host='0.0.0.0', port=port, debug=False, use_reloader=True)
@@ -3,12 +3,13 @@ GROUPID=$(bashio::config 'GROUPID')
 GROUPKEY=$(bashio::config 'GROUPKEY')
 export GROUP_ID=$GROUPID
 export GROUP_KEY=$GROUPKEY
+if bashio::config.true 'DEBUG'; then export MIELE_DEBUG=1; fi
 echo "ID: $GROUP_ID"
 echo "KEY: $GROUP_KEY"
 echo "Starting mileGateway..."
 while true
 do 
-  python3 miele_gateway.py
+  gunicorn --config /gunicorn.conf.py --chdir / miele_gateway:app
   sleep 2
   echo "Restarting..."
 done
@@ -0,0 +1,46 @@
+import itertools
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from miele_gateway import normalize_device_path
+
+def legacy_device_path(resource):
+    """The trailing-slash branching main_route used before normalize_device_path (kept verbatim for comparison)."""
+    path_parts = resource.strip('/').split('/')
+    resource_path_part = '/'.join(path_parts[1:])
+    original_request_path_had_trailing_slash = resource.endswith('/')
+    resource_path_on_device = "/" + resource_path_part
+    current_path_has_trailing_slash = resource_path_on_device.endswith('/')
+    if original_request_path_had_trailing_slash and not current_path_has_trailing_slash and resource_path_on_device != '/': resource_path_on_device += '/'
+    elif not original_request_path_had_trailing_slash and current_path_has_trailing_slash and resource_path_on_device != '/': resource_path_on_device = resource_path_on_device.rstrip('/')
+    if len(path_parts) == 1 and original_request_path_had_trailing_slash: resource_path_on_device = '/'
+    elif len(path_parts) == 1 and not original_request_path_had_trailing_slash: resource_path_on_device = '/'
+    return resource_path_on_device
+
+class NormalizeDevicePathTest(unittest.TestCase):
+    def test_known_paths(self):
+        cases = {
+            'host': '/',
+            'host/': '/',
+            'host/Devices': '/Devices',
+            'host/Devices/': '/Devices/',
+            'host/Devices/000123/State': '/Devices/000123/State',
+            'host/Devices/000123/State/': '/Devices/000123/State/',
+        }
+        for resource, expected in cases.items():
+            with self.subTest(resource=resource):
+                self.assertEqual(normalize_device_path(resource.strip('/').split('/')[1:], resource.endswith('/')), expected)
+
+    def test_matches_legacy_branching(self):
+        # Every resource string of up to six tokens, including leading, doubled and trailing slashes
+        for length in range(1, 7):
+            for tokens in itertools.product(('host', 'Devices', '/'), repeat=length):
+                resource = ''.join(tokens)
+                with self.subTest(resource=resource):
+                    self.assertEqual(normalize_device_path(resource.strip('/').split('/')[1:], resource.endswith('/')), legacy_device_path(resource))
+
+if __name__ == '__main__':
+    unittest.main()